@@ -1,53 +1,19 @@
 #!/usr/bin/env python3
 """
 Slack Emoji Reactions Counter
-Retrieves and counts reaction emojis used in a Slack channel.
+Retrieves and counts reaction emojis used in one or more Slack channels.
 """
 
 import os
 import sys
+import asyncio
 import argparse
 from collections import Counter
-from datetime import datetime
-from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
+from team_stats.slack_common import RateLimiter, create_client, create_session, get_channel_ids, get_max_concurrent_requests, paginate_history, parse_date_args
 
 
-def get_channel_id(client, channel_name):
-    """Get channel ID from channel name."""
-    try:
-        # Remove # prefix if present
-        channel_name = channel_name.lstrip('#')
-        
-        # List all channels the user is a member of
-        cursor = None
-        
-        while True:
-            result = client.users_conversations(
-                types="public_channel,private_channel",
-                limit=200,
-                cursor=cursor
-            )
-            
-            for channel in result['channels']:
-                if channel['name'] == channel_name:
-                    return channel['id']
-            
-            # Check if there are more channels
-            if not result.get('has_more'):
-                break
-            
-            cursor = result['response_metadata']['next_cursor']
-        
-        print(f"Error: Channel '{channel_name}' not found or you don't have access to it", file=sys.stderr)
-        return None
-    
-    except SlackApiError as e:
-        print(f"Error fetching channels: {e.response['error']}", file=sys.stderr)
-        return None
-
-
-def get_emoji_reactions(client, channel_id, date_from=None, date_to=None):
+async def get_emoji_reactions(client, limiter, channel_id, date_from=None, date_to=None):
     """Retrieve all emoji reactions from a channel."""
     emoji_counter = Counter()
     
@@ -57,33 +23,16 @@ def get_emoji_reactions(client, channel_id, date_from=None, date_to=None):
         latest = date_to.timestamp() if date_to else None
         
         # Get channel history
-        cursor = None
-        
-        while True:
-            params = {
-                'channel': channel_id,
-                'limit': 200,
-                'cursor': cursor
-            }
-            
-            if oldest:
-                params['oldest'] = oldest
-            if latest:
-                params['latest'] = latest
-            
-            result = client.conversations_history(**params)
-            
-            # Process messages
+        async for result in paginate_history(client, limiter, channel_id, oldest, latest):
+            # Sum the page into a plain dict, then add it to the totals in one update
+            page_counts = {}
+            page_counts_get = page_counts.get
             for message in result['messages']:
-                if 'reactions' in message:
-                    for reaction in message['reactions']:
-                        emoji_counter[reaction['name']] += reaction['count']
-            
-            # Check if there are more messages
-            if not result.get('has_more'):
-                break
+                for reaction in message.get('reactions', ()):
+                    name = reaction['name']
+                    page_counts[name] = page_counts_get(name, 0) + reaction['count']
             
-            cursor = result['response_metadata']['next_cursor']
+            emoji_counter.update(page_counts)
         
         return emoji_counter
     
@@ -92,10 +41,17 @@ def get_emoji_reactions(client, channel_id, date_from=None, date_to=None):
         return None
 
 
-def main():
+async def process_channel(client, limiter, semaphore, channel_id, channel_name, date_from=None, date_to=None):
+    """Retrieve one channel's emoji reactions, waiting for a free slot so only a few channels are fetched at once."""
+    async with semaphore:
+        print(f"Fetching emoji reactions from #{channel_name}...", file=sys.stderr)
+        return await get_emoji_reactions(client, limiter, channel_id, date_from, date_to)
+
+
+async def main():
     # Parse arguments
-    parser = argparse.ArgumentParser(description='Count emoji reactions in a Slack channel')
-    parser.add_argument('channel_name', help='Slack channel name')
+    parser = argparse.ArgumentParser(description='Count emoji reactions in one or more Slack channels')
+    parser.add_argument('channel_name', nargs='+', help='Slack channel name(s)')
     parser.add_argument('-df', '--date-from', dest='date_from', help='Start date (YYYY-MM-DD)')
     parser.add_argument('-dt', '--date-to', dest='date_to', help='End date (YYYY-MM-DD)')
     parser.add_argument('-t', '--top', type=int, dest='top', help='Show only top N results (highest to lowest)')
@@ -103,52 +59,62 @@ def main():
     args = parser.parse_args()
     
     # Parse dates if provided
-    date_from = None
-    date_to = None
-    
-    try:
-        if args.date_from:
-            date_from = datetime.strptime(args.date_from, '%Y-%m-%d')
-        if args.date_to:
-            # Set to end of day
-            date_to = datetime.strptime(args.date_to, '%Y-%m-%d')
-            date_to = date_to.replace(hour=23, minute=59, second=59)
-    except ValueError as e:
+    dates = parse_date_args(args)
+    if dates is None:
         print(f"Error: Invalid date format. Use YYYY-MM-DD", file=sys.stderr)
         sys.exit(1)
     
+    date_from, date_to = dates
+    
     # Get Slack token from environment
     slack_token = os.environ.get('SLACK_TOKEN')
     if not slack_token:
         print("Error: SLACK_TOKEN environment variable not set", file=sys.stderr)
         sys.exit(1)
     
-    # Initialize Slack client
-    client = WebClient(token=slack_token)
-    
-    # Get channel ID
-    channel_id = get_channel_id(client, args.channel_name)
-    if not channel_id:
+    # Get concurrency limit from environment
+    max_concurrent = get_max_concurrent_requests()
+    if max_concurrent is None:
+        print("Error: SLACK_MAX_CONCURRENT_REQUESTS must be a whole number of at least 1", file=sys.stderr)
         sys.exit(1)
     
-    # Get emoji reactions
-    print(f"Fetching emoji reactions from #{args.channel_name}...", file=sys.stderr)
-    emoji_counter = get_emoji_reactions(client, channel_id, date_from, date_to)
+    # Initialize Slack client, sharing one keep-alive connection pool across all requests
+    async with create_session() as session:
+        client = create_client(slack_token, session)
+        limiter = RateLimiter()
+        
+        # Get channel IDs
+        channels = await get_channel_ids(client, args.channel_name)
+        if channels is None:
+            sys.exit(1)
+        
+        _, channel_ids = channels
+        
+        # Get emoji reactions from all channels concurrently
+        semaphore = asyncio.Semaphore(max_concurrent)
+        counters = await asyncio.gather(*(
+            process_channel(client, limiter, semaphore, channel_id, channel_name, date_from, date_to)
+            for channel_id, channel_name in zip(channel_ids, args.channel_name)
+        ))
     
-    if emoji_counter is None:
+    if None in counters:
         print("Error: Failed to retrieve emoji reactions", file=sys.stderr)
         sys.exit(1)
     
-    # Display results
-    sorted_results = sorted(emoji_counter.items(), key=lambda x: x[1])
+    # Combine the channels' counts
+    emoji_counter = Counter()
+    for counter in counters:
+        emoji_counter.update(counter)
     
-    # Apply top filter if specified (reverse order for top results)
+    # Display results (top N in descending order if specified, otherwise ascending)
     if args.top:
-        sorted_results = sorted_results[-args.top:][::-1]
+        sorted_results = emoji_counter.most_common(args.top)
+    else:
+        sorted_results = sorted(emoji_counter.items(), key=lambda x: x[1])
     
     for emoji, count in sorted_results:
         print(f"{count} :{emoji}:")
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -1,99 +1,20 @@
 #!/usr/bin/env python3
 """
 Slack Message Counter
-Counts messages and replies in a Slack channel, optionally per user.
+Counts messages and replies in one or more Slack channels, optionally per user.
 """
 
 import os
 import sys
+import heapq
+import asyncio
 import argparse
-from datetime import datetime
-from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
+from team_stats.slack_common import RateLimiter, create_client, create_session, get_channel_ids, get_max_concurrent_requests, paginate_history, parse_date_args, resolve_users_bulk
 
 
-def get_channel_id(client, channel_name):
-    """Get channel ID from channel name."""
-    try:
-        # Remove # prefix if present
-        channel_name = channel_name.lstrip('#')
-        
-        # List all channels the user is a member of
-        cursor = None
-        
-        while True:
-            result = client.users_conversations(
-                types="public_channel,private_channel",
-                limit=200,
-                cursor=cursor
-            )
-            
-            for channel in result['channels']:
-                if channel['name'] == channel_name:
-                    return channel['id']
-            
-            # Check if there are more channels
-            if not result.get('has_more'):
-                break
-            
-            cursor = result['response_metadata']['next_cursor']
-        
-        print(f"Error: Channel '{channel_name}' not found or you don't have access to it", file=sys.stderr)
-        return None
-    
-    except SlackApiError as e:
-        print(f"Error fetching channels: {e.response['error']}", file=sys.stderr)
-        return None
-
-
-def get_user_display(client, user_id, is_bot, user_cache):
-    """Get user display name from user ID, with caching."""
-    if user_id in user_cache:
-        return user_cache[user_id]
-    
-    try:
-        if is_bot:
-            # For bots, try to get bot info
-            result = client.bots_info(bot=user_id)
-            bot_name = result['bot'].get('name', user_id)
-            display = f"{bot_name}:{user_id}"
-        else:
-            # For users, get email
-            result = client.users_info(user=user_id)
-            user = result['user']
-            
-            # Check if it's actually a bot/app (has is_bot or is_app_user flag)
-            if user.get('is_bot') or user.get('is_app_user'):
-                # It's a bot/app, use the real_name or name
-                name = user.get('real_name') or user.get('name', user_id)
-                display = f"{name}:{user_id}"
-            else:
-                # It's a real user, use email
-                email = user['profile'].get('email', user_id)
-                display = f"{email}:{user_id}"
-        
-        user_cache[user_id] = display
-        return display
-    except SlackApiError as e:
-        error_type = e.response.get('error', 'unknown')
-        
-        # Handle deleted/not found bots
-        if error_type == 'bot_not_found':
-            print(f"Warning: Bot {user_id} not found (likely deleted)", file=sys.stderr)
-            display = f"Unknown (bot):{user_id}"
-        elif error_type == 'user_not_found':
-            print(f"Warning: User {user_id} not found", file=sys.stderr)
-            display = f"Unknown (user):{user_id}"
-        else:
-            print(f"Warning: Could not retrieve info for {user_id}: {error_type}", file=sys.stderr)
-            display = f"{user_id}:{user_id}"
-        
-        user_cache[user_id] = display
-        return display
-
-
-def count_messages(client, channel_id, channel_name, count_replies, count_messages, per_user, date_from=None, date_to=None):
-    """Count messages and/or replies in a channel."""
+async def count_messages(client, limiter, channel_id, count_replies, count_messages, per_user, date_from=None, date_to=None):
+    """Count messages and/or replies in a channel, returning (total_count, user_counts, user_is_bot)."""
     try:
         # Convert dates to timestamps if provided
         oldest = date_from.timestamp() if date_from else None
@@ -103,25 +24,14 @@ def count_messages(client, channel_id, channel_name, count_replies, count_messag
         total_count = 0
         user_counts = {}
         user_is_bot = {}
-        user_cache = {}
+        user_counts_get = user_counts.get
         
-        # Get channel history
-        cursor = None
+        # Decide once which kinds of message are counted (neither flag means both)
+        want_replies = count_replies or not count_messages
+        want_messages = count_messages or not count_replies
         
-        while True:
-            params = {
-                'channel': channel_id,
-                'limit': 200,
-                'cursor': cursor
-            }
-            
-            if oldest:
-                params['oldest'] = oldest
-            if latest:
-                params['latest'] = latest
-            
-            result = client.conversations_history(**params)
-            
+        # Get channel history
+        async for result in paginate_history(client, limiter, channel_id, oldest, latest):
             # Process messages
             for message in result['messages']:
                 # Get user identifier and check if it's a bot
@@ -137,52 +47,47 @@ def count_messages(client, channel_id, channel_name, count_replies, count_messag
                     user_id = 'unknown'
                     is_bot = True
                 
-                is_reply = 'thread_ts' in message and message.get('thread_ts') != message.get('ts')
+                thread_ts = message.get('thread_ts')
+                is_reply = thread_ts is not None and thread_ts != message['ts']
                 
                 # Count based on filters
-                should_count = False
-                if count_replies and count_messages:
-                    should_count = True
-                elif count_replies and is_reply:
-                    should_count = True
-                elif count_messages and not is_reply:
-                    should_count = True
-                elif not count_replies and not count_messages:
-                    should_count = True
-                
-                if should_count:
+                if (want_replies if is_reply else want_messages):
                     total_count += 1
                     if per_user:
-                        if user_id not in user_counts:
-                            user_counts[user_id] = 0
+                        count = user_counts_get(user_id)
+                        if count is None:
                             user_is_bot[user_id] = is_bot
-                        user_counts[user_id] += 1
-            
-            # Check if there are more messages
-            if not result.get('has_more'):
-                break
-            
-            cursor = result['response_metadata']['next_cursor']
+                            count = 0
+                        user_counts[user_id] = count + 1
         
-        # Format output
-        if per_user:
-            results = []
-            for user_id, count in user_counts.items():
-                display = get_user_display(client, user_id, user_is_bot[user_id], user_cache)
-                results.append((count, f"{channel_name}:{display}"))
-            return results
-        else:
-            return [(total_count, channel_name)]
+        return total_count, user_counts, user_is_bot
     
     except SlackApiError as e:
         print(f"Error fetching messages: {e.response['error']}", file=sys.stderr)
         return None
 
 
-def main():
+async def process_channel(client, limiter, semaphore, channel_id, channel_name, args, date_from=None, date_to=None):
+    """Count one channel's messages, waiting for a free slot so only a few channels are fetched at once."""
+    async with semaphore:
+        print(f"Counting messages in #{channel_name}...", file=sys.stderr)
+        return await count_messages(client, limiter, channel_id, args.replies, args.messages, args.user, date_from, date_to)
+
+
+def iter_results(channel_names, channel_counts, per_user, user_cache):
+    """Yield (count, label) tuples for each channel, per user if requested."""
+    for channel_name, (total_count, user_counts, _) in zip(channel_names, channel_counts):
+        if per_user:
+            for user_id, count in user_counts.items():
+                yield count, f"{channel_name}:{user_cache[user_id]}"
+        else:
+            yield total_count, channel_name
+
+
+async def main():
     # Parse arguments
-    parser = argparse.ArgumentParser(description='Count messages in a Slack channel')
-    parser.add_argument('channel_name', help='Slack channel name')
+    parser = argparse.ArgumentParser(description='Count messages in one or more Slack channels')
+    parser.add_argument('channel_name', nargs='+', help='Slack channel name(s)')
     parser.add_argument('-r', '--replies', action='store_true', help='Count only replies')
     parser.add_argument('-m', '--messages', action='store_true', help='Count only messages (not replies)')
     parser.add_argument('-u', '--user', action='store_true', help='Show counts per user')
@@ -193,57 +98,64 @@ def main():
     args = parser.parse_args()
     
     # Parse dates if provided
-    date_from = None
-    date_to = None
-    
-    try:
-        if args.date_from:
-            date_from = datetime.strptime(args.date_from, '%Y-%m-%d')
-        if args.date_to:
-            # Set to end of day
-            date_to = datetime.strptime(args.date_to, '%Y-%m-%d')
-            date_to = date_to.replace(hour=23, minute=59, second=59)
-    except ValueError as e:
+    dates = parse_date_args(args)
+    if dates is None:
         print(f"Error: Invalid date format. Use YYYY-MM-DD", file=sys.stderr)
         sys.exit(1)
     
+    date_from, date_to = dates
+    
     # Get Slack token from environment
     slack_token = os.environ.get('SLACK_TOKEN')
     if not slack_token:
         print("Error: SLACK_TOKEN environment variable not set", file=sys.stderr)
         sys.exit(1)
     
-    # Initialize Slack client
-    client = WebClient(token=slack_token)
-    
-    # Get channel ID
-    channel_id = get_channel_id(client, args.channel_name)
-    if not channel_id:
+    # Get concurrency limit from environment
+    max_concurrent = get_max_concurrent_requests()
+    if max_concurrent is None:
+        print("Error: SLACK_MAX_CONCURRENT_REQUESTS must be a whole number of at least 1", file=sys.stderr)
         sys.exit(1)
     
-    # Count messages
-    print(f"Counting messages in #{args.channel_name}...", file=sys.stderr)
-    results = count_messages(
-        client, 
-        channel_id, 
-        args.channel_name,
-        args.replies, 
-        args.messages, 
-        args.user,
-        date_from, 
-        date_to
-    )
-    
-    if results is None:
-        print("Error: Failed to count messages", file=sys.stderr)
-        sys.exit(1)
+    # Initialize Slack client, sharing one keep-alive connection pool across all requests
+    async with create_session() as session:
+        client = create_client(slack_token, session)
+        limiter = RateLimiter()
+        
+        # Get channel IDs (team_id is only looked up if a channel name needs the cache)
+        channels = await get_channel_ids(client, args.channel_name)
+        if channels is None:
+            sys.exit(1)
+        
+        team_id, channel_ids = channels
+        
+        # Count messages in all channels concurrently
+        semaphore = asyncio.Semaphore(max_concurrent)
+        channel_counts = await asyncio.gather(*(
+            process_channel(client, limiter, semaphore, channel_id, channel_name, args, date_from, date_to)
+            for channel_id, channel_name in zip(channel_ids, args.channel_name)
+        ))
+        
+        if None in channel_counts:
+            print("Error: Failed to count messages", file=sys.stderr)
+            sys.exit(1)
+        
+        # Resolve the users and bots of all channels in one go
+        user_cache = {}
+        if args.user:
+            user_is_bot = {}
+            for _, _, channel_is_bot in channel_counts:
+                user_is_bot.update(channel_is_bot)
+            
+            user_cache = await resolve_users_bulk(client, team_id, user_is_bot, max_concurrent)
     
-    # Sort results by count (ascending by default)
-    sorted_results = sorted(results, key=lambda x: x[0])
+    results = iter_results(args.channel_name, channel_counts, args.user, user_cache)
     
-    # Apply top filter if specified (reverse order for top results)
+    # Sort results by count (top N in descending order if specified, otherwise ascending)
     if args.top:
-        sorted_results = sorted_results[-args.top:][::-1]
+        sorted_results = heapq.nlargest(args.top, results, key=lambda x: x[0])
+    else:
+        sorted_results = sorted(results, key=lambda x: x[0])
     
     # Display results
     for count, label in sorted_results:
@@ -251,4 +163,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1 @@
+"""Shared code for the team-stats scripts."""
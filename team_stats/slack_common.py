@@ -0,0 +1,434 @@
+"""
+Shared Slack helpers for the team-stats scripts.
+Channel lookup, history pagination, user resolution, date parsing and the on-disk caches.
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import asyncio
+import hashlib
+import aiohttp
+from datetime import datetime
+from slack_sdk.web.async_client import AsyncWebClient
+from slack_sdk.errors import SlackApiError
+from slack_sdk.http_retry.builtin_async_handlers import (
+    AsyncConnectionErrorRetryHandler,
+    AsyncRateLimitErrorRetryHandler,
+    AsyncServerErrorRetryHandler,
+)
+from slack_sdk.http_retry.builtin_interval_calculators import BackoffRetryIntervalCalculator
+
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'team-stats')
+CHANNEL_CACHE_FILE = os.path.join(CACHE_DIR, 'channels.json')
+HISTORY_CACHE_DIR = os.path.join(CACHE_DIR, 'history')
+HISTORY_CACHE_MIN_AGE = 60 * 60
+USER_CACHE_FILE = os.path.join(CACHE_DIR, 'users.json')
+USER_CACHE_MAX_AGE = 24 * 60 * 60
+CHANNEL_ID_PATTERN = re.compile(r'^[CGD][A-Z0-9]{8,}$')
+
+# conversations.history is Tier 3 (~50 requests per minute)
+HISTORY_RATE = 50 / 60
+HISTORY_MAX_TOKENS = 50
+
+# Seconds before a Slack request is abandoned (AsyncWebClient's default)
+HTTP_TIMEOUT = 30
+
+# Retries per request, shared by all retry handlers (slack_sdk keeps one attempt counter per request)
+MAX_RETRIES = 5
+
+# Default number of channels and user/bot lookups in flight at once
+DEFAULT_MAX_CONCURRENT_REQUESTS = 3
+
+
+class RateLimiter:
+    """Token bucket that spaces out API calls to stay under a Slack rate limit tier."""
+    
+    def __init__(self, rate=HISTORY_RATE, max_tokens=HISTORY_MAX_TOKENS):
+        self.rate = rate
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self):
+        """Wait until a token is available, then consume it."""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.max_tokens, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def load_cache(path):
+    """Load a JSON cache file, returning an empty cache if it is missing or unreadable."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def make_cache_dir(path):
+    """Create a cache directory readable only by the current user (caches hold private messages and emails)."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    
+    # makedirs leaves existing directories alone, so tighten any left by older runs
+    os.chmod(path, 0o700)
+
+
+def save_cache(path, cache):
+    """Write a JSON cache file, ignoring failures."""
+    try:
+        make_cache_dir(CACHE_DIR)
+        with open(path, 'w') as f:
+            json.dump(cache, f)
+    except OSError:
+        pass
+
+
+def create_session():
+    """Create the aiohttp session shared by all Slack calls, keeping connections alive between requests."""
+    connector = aiohttp.TCPConnector(limit=20, ttl_dns_cache=300)
+    
+    # slack_sdk only applies its own timeout to sessions it creates, so set the same one here
+    timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+class AnyServerErrorRetryHandler(AsyncServerErrorRetryHandler):
+    """Retry handler for every 5xx response (slack_sdk's own only retries 500 and 503)."""
+    
+    async def _can_retry_async(self, *, state, request, response=None, error=None):
+        return response is not None and 500 <= response.status_code < 600
+
+
+def create_client(slack_token, session):
+    """Create the Slack client, retrying on rate limits (after Retry-After), server errors and dropped connections."""
+    # Every handler checks the same attempt counter, so together they allow MAX_RETRIES retries per request
+    retry_handlers = [
+        AsyncConnectionErrorRetryHandler(max_retry_count=MAX_RETRIES),
+        AsyncRateLimitErrorRetryHandler(max_retry_count=MAX_RETRIES),
+        # Waits 2 ** attempt seconds (plus up to 1 second of jitter), where attempt counts earlier retries of any
+        # kind; at most 16 seconds with 5 retries, so no 60 second cap is needed
+        AnyServerErrorRetryHandler(
+            max_retry_count=MAX_RETRIES,
+            interval_calculator=BackoffRetryIntervalCalculator(backoff_factor=1.0)
+        ),
+    ]
+    return AsyncWebClient(token=slack_token, session=session, retry_handlers=retry_handlers)
+
+
+def get_max_concurrent_requests():
+    """Get the concurrency limit from SLACK_MAX_CONCURRENT_REQUESTS, or None if it is not a whole number of at least 1."""
+    try:
+        max_concurrent = int(os.environ.get('SLACK_MAX_CONCURRENT_REQUESTS', DEFAULT_MAX_CONCURRENT_REQUESTS))
+    except ValueError:
+        return None
+    
+    if max_concurrent < 1:
+        return None
+    
+    return max_concurrent
+
+
+def parse_date_args(args):
+    """Parse the --date-from/--date-to arguments into (date_from, date_to) datetimes."""
+    date_from = None
+    date_to = None
+    
+    try:
+        if args.date_from:
+            date_from = datetime.strptime(args.date_from, '%Y-%m-%d')
+        if args.date_to:
+            # Set to end of day
+            date_to = datetime.strptime(args.date_to, '%Y-%m-%d')
+            date_to = date_to.replace(hour=23, minute=59, second=59)
+    except ValueError:
+        return None
+    
+    return date_from, date_to
+
+
+async def get_team_id(client):
+    """Get the workspace (team) ID for the token, used to key the on-disk caches."""
+    try:
+        result = await client.auth_test()
+        return result['team_id']
+    
+    except SlackApiError as e:
+        print(f"Error fetching workspace: {e.response['error']}", file=sys.stderr)
+        return None
+
+
+async def get_channel_ids(client, channel_names):
+    """Get (team_id, channel_ids) for channel names or IDs, looking up the workspace only if a name needs the cache."""
+    # Runs given only channel IDs need no workspace or cache
+    if all(CHANNEL_ID_PATTERN.match(channel_name.lstrip('#')) for channel_name in channel_names):
+        return None, [channel_name.lstrip('#') for channel_name in channel_names]
+    
+    team_id = await get_team_id(client)
+    if not team_id:
+        return None
+    
+    cache = load_cache(CHANNEL_CACHE_FILE)
+    team_channels = cache.setdefault(team_id, {})
+    cached_channels = dict(team_channels)
+    
+    channel_ids = []
+    for channel_name in channel_names:
+        channel_id = await get_channel_id(client, team_channels, channel_name)
+        if not channel_id:
+            channel_ids = None
+            break
+        channel_ids.append(channel_id)
+    
+    # Keep whatever was learned during the scans, even if a channel was not found
+    if team_channels != cached_channels:
+        save_cache(CHANNEL_CACHE_FILE, cache)
+    
+    if channel_ids is None:
+        return None
+    
+    return team_id, channel_ids
+
+
+async def get_channel_id(client, team_channels, channel_name):
+    """Get channel ID from channel name (or return it directly if already an ID)."""
+    try:
+        # Remove # prefix if present
+        channel_name = channel_name.lstrip('#')
+        
+        # Channel IDs need no lookup
+        if CHANNEL_ID_PATTERN.match(channel_name):
+            return channel_name
+        
+        # Check this workspace's cached channels first
+        if channel_name in team_channels:
+            return team_channels[channel_name]
+        
+        # List all channels the user is a member of, remembering every one seen
+        cursor = None
+        channel_id = None
+        
+        while True:
+            result = await client.users_conversations(
+                types="public_channel,private_channel",
+                limit=1000,
+                cursor=cursor
+            )
+            
+            for channel in result['channels']:
+                team_channels[channel['name']] = channel['id']
+                if channel['name'] == channel_name:
+                    channel_id = channel['id']
+            
+            # Stop once found or when there are no more channels
+            if channel_id or not result.get('has_more'):
+                break
+            
+            cursor = result['response_metadata']['next_cursor']
+        
+        if channel_id:
+            return channel_id
+        
+        print(f"Error: Channel '{channel_name}' not found or you don't have access to it", file=sys.stderr)
+        return None
+    
+    except SlackApiError as e:
+        print(f"Error fetching channels: {e.response['error']}", file=sys.stderr)
+        return None
+
+
+async def cached_history(client, limiter, params):
+    """Get one conversations_history page, using the on-disk cache for ranges that have ended."""
+    # Only history that ended over an hour ago is cached, newer pages may still change
+    cache_file = None
+    latest = params.get('latest')
+    if latest and latest < time.time() - HISTORY_CACHE_MIN_AGE:
+        key = json.dumps([params['channel'], params.get('oldest'), latest, params['cursor']]).encode()
+        cache_file = os.path.join(HISTORY_CACHE_DIR, hashlib.blake2b(key, digest_size=16).hexdigest() + '.json.gz')
+        
+        try:
+            with gzip.open(cache_file, 'rt') as f:
+                return json.load(f)
+        except (OSError, EOFError, ValueError):
+            pass
+    
+    await limiter.acquire()
+    result = await client.conversations_history(**params)
+    
+    if cache_file:
+        try:
+            make_cache_dir(CACHE_DIR)
+            make_cache_dir(HISTORY_CACHE_DIR)
+            with gzip.open(cache_file + '.tmp', 'wt') as f:
+                json.dump(result.data, f)
+            os.replace(cache_file + '.tmp', cache_file)
+        except OSError:
+            pass
+    
+    return result
+
+
+async def paginate_history(client, limiter, channel_id, oldest=None, latest=None):
+    """Yield conversations_history pages, fetching the next page while the current one is processed."""
+    # Build the request once, only the cursor changes between pages
+    params = {
+        'channel': channel_id,
+        'limit': 200,
+        'cursor': None
+    }
+    
+    if oldest:
+        params['oldest'] = oldest
+    if latest:
+        params['latest'] = latest
+    
+    next_page = asyncio.ensure_future(cached_history(client, limiter, params))
+    
+    try:
+        while next_page:
+            result = await next_page
+            next_page = None
+            
+            # Defensive guard only: Slack already returns just messages newer than oldest and ends
+            # with has_more unset, but if a page ever reaches oldest (messages come newest first)
+            # there is nothing older worth requesting
+            messages = result['messages']
+            reached_oldest = oldest and messages and float(messages[-1]['ts']) <= oldest
+            
+            # Start fetching the next page before handing this one to the caller
+            if result.get('has_more') and not reached_oldest:
+                params['cursor'] = result['response_metadata']['next_cursor']
+                next_page = asyncio.ensure_future(cached_history(client, limiter, params))
+                
+                # Let the new task run up to its first await so the request is sent before the caller processes this page
+                await asyncio.sleep(0)
+            
+            yield result
+    finally:
+        if next_page:
+            next_page.cancel()
+
+
+async def get_workspace_users(client):
+    """Get display names for all workspace users via paginated users.list."""
+    try:
+        user_cache = {}
+        cursor = None
+        
+        while True:
+            result = await client.users_list(limit=1000, cursor=cursor)
+            
+            for user in result['members']:
+                user_cache[user['id']] = format_user_display(user)
+            
+            # Check if there are more users
+            cursor = result.get('response_metadata', {}).get('next_cursor')
+            if not cursor:
+                break
+        
+        return user_cache
+    
+    except SlackApiError as e:
+        print(f"Warning: Could not list workspace users, looking users up individually: {e.response['error']}", file=sys.stderr)
+        return None
+
+
+def format_user_display(user):
+    """Get display name from a Slack user object."""
+    user_id = user['id']
+    
+    # Check if it's actually a bot/app (has is_bot or is_app_user flag)
+    if user.get('is_bot') or user.get('is_app_user'):
+        # It's a bot/app, use the real_name or name
+        name = user.get('real_name') or user.get('name', user_id)
+        return f"{name}:{user_id}"
+    
+    # It's a real user, use email
+    email = user['profile'].get('email', user_id)
+    return f"{email}:{user_id}"
+
+
+async def get_user_display(client, user_id, is_bot, user_cache, semaphore):
+    """Get user display name from user ID, with caching."""
+    if user_id in user_cache:
+        return user_cache[user_id]
+    
+    try:
+        async with semaphore:
+            if is_bot:
+                # For bots, try to get bot info
+                result = await client.bots_info(bot=user_id)
+                bot_name = result['bot'].get('name', user_id)
+                display = f"{bot_name}:{user_id}"
+            else:
+                # For users missing from users.list, look them up individually
+                result = await client.users_info(user=user_id)
+                display = format_user_display(result['user'])
+        
+        user_cache[user_id] = display
+        return display
+    except SlackApiError as e:
+        error_type = e.response.get('error', 'unknown')
+        
+        # Handle deleted/not found bots
+        if error_type == 'bot_not_found':
+            print(f"Warning: Bot {user_id} not found (likely deleted)", file=sys.stderr)
+            display = f"Unknown (bot):{user_id}"
+        elif error_type == 'user_not_found':
+            print(f"Warning: User {user_id} not found", file=sys.stderr)
+            display = f"Unknown (user):{user_id}"
+        else:
+            print(f"Warning: Could not retrieve info for {user_id}: {error_type}", file=sys.stderr)
+            display = f"{user_id}:{user_id}"
+        
+        user_cache[user_id] = display
+        return display
+
+
+async def resolve_users_bulk(client, team_id, user_is_bot, max_concurrent):
+    """Get display names for a {user_id: is_bot} mapping, using one users.list scan per day."""
+    # The workspace keys the user cache, look it up only if the channel lookup did not already
+    if team_id is None and not all(user_is_bot.values()):
+        team_id = await get_team_id(client)
+    
+    # Resolve human users from the cached workspace directory, refreshing it once a day
+    # (without a workspace, every user falls through to the per-id lookups below)
+    user_cache = {}
+    if team_id and not all(user_is_bot.values()):
+        cache = load_cache(USER_CACHE_FILE)
+        team_users = cache.get(team_id)
+        
+        if not team_users or team_users.get('updated_at', 0) < time.time() - USER_CACHE_MAX_AGE:
+            users = await get_workspace_users(client)
+            
+            # If the scan fails, every user falls through to the per-id lookups below
+            team_users = {'users': {}}
+            if users is not None:
+                team_users = {'updated_at': time.time(), 'users': users}
+                cache[team_id] = team_users
+                save_cache(USER_CACHE_FILE, cache)
+        
+        user_cache = {user_id: team_users['users'][user_id] for user_id in user_is_bot if user_id in team_users['users']}
+    
+    # Look up the remaining bots and users concurrently
+    semaphore = asyncio.Semaphore(max_concurrent)
+    await asyncio.gather(*(
+        get_user_display(client, user_id, is_bot, user_cache, semaphore)
+        for user_id, is_bot in user_is_bot.items()
+        if user_id not in user_cache
+    ))
+    
+    return user_cache